@@ -178,6 +178,14 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Shared cache, used for conversation membership lookups
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/2",  # Redis DB 2 for the cache
+    },
+}
+
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://localhost:6379/1'  # Different DB from channels
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/1'
@@ -221,5 +229,9 @@ LOGGING = {
             'handlers': ['console'],
             'level': 'INFO',
         },
+        'chat.views': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
     },
 }
@@ -1,7 +1,9 @@
-import json
-import base64
+import asyncio
+import binascii
+import re
+from collections import namedtuple
+import orjson
 from channels.generic.websocket import AsyncWebsocketConsumer
-from django.contrib.auth.models import User
 from users.models import UserProfile
 from .models import Conversation, Message
 from .serializers import MessageSerializer, ConversationSerializer
@@ -9,23 +11,19 @@ from asgiref.sync import sync_to_async
 from django.urls import reverse
 from django.conf import settings
 from django.utils import timezone
-import random
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_save
+from django.core.exceptions import PermissionDenied
 from channels.db import database_sync_to_async
-from django.shortcuts import get_object_or_404
 from rest_framework_simplejwt.tokens import UntypedToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from urllib.parse import parse_qs
+from users.signals import create_profile_with_phone_number
+from .utils import restore_conversation_for_participants, get_conversation_members, invalidate_conversation_members
 from .tasks import create_and_schedule_email_notification, cancel_pending_notifications_for_message
 
 # JWT authentication is now handled by middleware
 
-@database_sync_to_async
-def generate_unique_phone_number():
-    while True:
-        number = f"03{random.randint(100000000, 999999999)}"
-        if not UserProfile.objects.filter(phone_number=number).exists():
-            return number
-
 def schedule_email_notification_sync(message_id):
     """Schedule email notification task - synchronous version"""
     try:
@@ -50,42 +48,176 @@ def cancel_email_notifications_sync(message_id):
         logger.warning(f"Failed to cancel email notifications for message {message_id}: {str(e)}")
         return None
 
-@database_sync_to_async
-def get_user_by_username(username):
-    return User.objects.get(username=username)
+# Resolved once at import instead of on every message
+BASE_API_URL = settings.BASE_API_URL
 
-@database_sync_to_async
-def get_userprofile_by_user(user):
-    return UserProfile.objects.get(user=user)
+def dump_json(data):
+    """Serialize a WebSocket payload to text with orjson"""
+    return orjson.dumps(data).decode()
 
-@database_sync_to_async
-def get_conversation_by_id(conversation_id):
-    return Conversation.objects.get(id=conversation_id)
+# Base64 audio larger than this is processed in chunks, yielding to the event loop in between
+AUDIO_INLINE_LIMIT = 1024 * 1024
+AUDIO_DECODE_CHUNK = 256 * 1024  # base64 characters, multiple of 4
+AUDIO_ENCODE_CHUNK = 192 * 1024  # raw bytes, multiple of 3
+# Anything a2b_base64 would skip, stripped per slice so decoded chunks stay aligned to 4 characters
+NON_BASE64_CHARS = re.compile(r'[^A-Za-z0-9+/=]')
 
-@database_sync_to_async
-def get_message_by_id(message_id):
-    return get_object_or_404(Message, id=message_id)
+async def decode_audio_base64(data):
+    """Decode base64 audio without stalling other sockets on large payloads"""
+    if len(data) <= AUDIO_INLINE_LIMIT:
+        return binascii.a2b_base64(data)
+    chunks = []
+    leftover = ''
+    for start in range(0, len(data), AUDIO_DECODE_CHUNK):
+        # Line-wrapped input is cleaned slice by slice, an incomplete quantum carries over to the next one
+        piece = leftover + NON_BASE64_CHARS.sub('', data[start:start + AUDIO_DECODE_CHUNK])
+        cut = len(piece) - len(piece) % 4
+        leftover = piece[cut:]
+        chunks.append(binascii.a2b_base64(piece[:cut]))
+        await asyncio.sleep(0)
+    if leftover:
+        chunks.append(binascii.a2b_base64(leftover))
+    return b''.join(chunks)
 
-@database_sync_to_async
-def update_message_content(message, content):
-    message.content = content.strip()
-    message.save()
+async def encode_audio_base64(data):
+    """Encode audio as base64 text without stalling other sockets on large payloads"""
+    if len(data) <= AUDIO_INLINE_LIMIT:
+        return binascii.b2a_base64(data, newline=False).decode('ascii')
+    chunks = []
+    view = memoryview(data)
+    for start in range(0, len(view), AUDIO_ENCODE_CHUNK):
+        chunks.append(binascii.b2a_base64(view[start:start + AUDIO_ENCODE_CHUNK], newline=False))
+        await asyncio.sleep(0)
+    return b''.join(chunks).decode('ascii')
 
-@database_sync_to_async
-def delete_message(message):
-    message.delete()
+# Everything receive() needs to store and broadcast a message, cached per connection
+MessageContext = namedtuple('MessageContext', [
+    'user',
+    'profile',
+    'conversation_id',
+    'recipient_profile',
+    'sender_picture_url',
+    'recipient_picture_url',
+])
 
 @database_sync_to_async
-def get_messages_by_ids(message_ids, recipient_profile):
-    return list(Message.objects.filter(
-        id__in=message_ids,
-        recipient=recipient_profile,
-        is_read=False
-    ))
+def load_message_context(sender_user, sender_profile, conversation_id):
+    """Fetch conversation and recipient for the authenticated sender in one thread hop"""
+    if sender_profile is None:
+        # Create profile if it doesn't exist (for Google users)
+        try:
+            sender_profile = create_profile_with_phone_number(sender_user)
+        except IntegrityError:
+            # Another connection created the profile first
+            sender_profile = UserProfile.objects.filter(user=sender_user).first()
+            if sender_profile is None:
+                raise
+
+    # Membership comes from the shared cache, only the recipient's profile row is read
+    participant_ids = get_conversation_members(conversation_id)
+    if participant_ids is None:
+        raise Conversation.DoesNotExist("Conversation matching query does not exist.")
+
+    if sender_profile.id not in participant_ids:
+        raise PermissionDenied("You are not a participant in this conversation")
+
+    # Find recipient: all participants except the sender
+    recipient_ids = [pid for pid in participant_ids if pid != sender_profile.id]
+    if not recipient_ids:
+        raise ValueError("No recipient found in conversation")
+    recipient_profile = UserProfile.objects.only('id', 'profile_picture').filter(id=recipient_ids[0]).first()
+    if recipient_profile is None:
+        # Profile deleted since the membership was cached
+        invalidate_conversation_members(conversation_id)
+        raise ValueError("No recipient found in conversation")
+
+    # Build absolute URL for profile pictures
+    sender_picture_url = None
+    recipient_picture_url = None
+
+    if sender_profile.profile_picture:
+        sender_picture_url = BASE_API_URL + sender_profile.profile_picture.url
+    if recipient_profile.profile_picture:
+        recipient_picture_url = BASE_API_URL + recipient_profile.profile_picture.url
+
+    return MessageContext(
+        user=sender_user,
+        profile=sender_profile,
+        conversation_id=int(conversation_id),
+        recipient_profile=recipient_profile,
+        sender_picture_url=sender_picture_url,
+        recipient_picture_url=recipient_picture_url,
+    )
+
+# Messages arriving within this window are inserted together with one bulk_create
+MESSAGE_BATCH_SIZE = 50
+MESSAGE_BATCH_WINDOW = 0.01  # seconds
+
+_message_queue = None
+_message_writer = None
 
 @database_sync_to_async
-def mark_messages_as_read(message_ids):
-    return Message.objects.filter(id__in=message_ids).update(is_read=True)
+def save_message_batch(messages):
+    """Insert a batch of messages and fire the post_save handlers bulk_create skips"""
+    try:
+        with transaction.atomic():
+            Message.objects.bulk_create(messages)
+    except Exception:
+        # Fall back to one insert per message so a single bad row doesn't fail the rest
+        results = []
+        for message in messages:
+            try:
+                message.save(force_insert=True)
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        return results
+
+    # Email notifications hang off post_save, send it the way Model.save() would
+    for message in messages:
+        post_save.send(sender=Message, instance=message, created=True, update_fields=None, raw=False, using=message._state.db)
+    return [None] * len(messages)
+
+async def message_writer(queue):
+    """Drain queued messages into batched INSERTs for the life of the event loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + MESSAGE_BATCH_WINDOW
+        while len(batch) < MESSAGE_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        try:
+            results = await save_message_batch([message for message, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (message, future), error in zip(batch, results):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(message)
+            else:
+                future.set_exception(error)
+
+async def create_message(**fields):
+    """Queue a message for the batched writer and wait until it has been saved"""
+    global _message_queue, _message_writer
+    loop = asyncio.get_running_loop()
+    # The writer is tied to the loop it was started on
+    if _message_writer is None or _message_writer.done() or _message_writer.get_loop() is not loop:
+        _message_queue = asyncio.Queue()
+        _message_writer = loop.create_task(message_writer(_message_queue))
+
+    future = loop.create_future()
+    await _message_queue.put((Message(**fields), future))
+    return await future
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -94,6 +226,33 @@ class ChatConsumer(AsyncWebsocketConsumer):
         
         if self.user and not self.user.is_anonymous:
             self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
+            self.user_profile = None
+            self._ctx = None
+            self._pending_audio_header = None
+            # Clients opt in to receiving audio as binary frames with ?binary=1,
+            # everyone else gets the header alone and loads the audio from audio_url
+            query_params = parse_qs(self.scope.get('query_string', b'').decode())
+            self.binary_audio = query_params.get('binary', ['0'])[0] == '1'
+
+            # Resolve recipient and profile picture URLs up front so receive() only reads cached values.
+            # This runs before joining the group or touching presence, so rejected sockets leave no trace
+            user_profile = await UserProfile.objects.filter(user=self.user).afirst()
+            try:
+                self._ctx = await load_message_context(self.user, user_profile, self.conversation_id)
+                user_profile = self._ctx.profile
+            except PermissionDenied:
+                await self.close(code=4003)  # Not a participant
+                return
+            except Conversation.DoesNotExist:
+                await self.close(code=4004)  # Conversation not found
+                return
+            except Exception as e:
+                # No recipient yet, or a database/cache failure: retried and reported when a message is sent
+                import logging
+                logger = logging.getLogger(__name__)
+                logger.warning(f"Could not load message context for conversation {self.conversation_id}: {str(e)}")
+            self.user_profile = user_profile
+
             self.room_group_name = f'chat_{self.conversation_id}'
             await self.channel_layer.group_add(
                 self.room_group_name,
@@ -102,44 +261,48 @@ class ChatConsumer(AsyncWebsocketConsumer):
             
             # Only mark user as online when connecting if they have valid authentication
             # This prevents users from appearing online after they've logged out
-            try:
-                user_profile = await database_sync_to_async(UserProfile.objects.get)(user=self.user)
+            if user_profile is not None:
                 # Only set online if user has a valid session/token - 
                 # the middleware already validates the JWT token, so if we reach here, user is authenticated
                 user_profile.is_online = True
                 user_profile.last_seen = timezone.now()
-                await database_sync_to_async(user_profile.save)(update_fields=['is_online', 'last_seen'])
-            except UserProfile.DoesNotExist:
-                pass  # User profile doesn't exist yet
-            
+                await user_profile.asave(update_fields=['is_online', 'last_seen'])
+
             await self.accept()
         else:
             await self.close(code=4001)  # Unauthorized
 
     async def disconnect(self, close_code):
+        self._ctx = None
+
+        # Sockets rejected in connect() never joined the group or went online
+        if not hasattr(self, 'room_group_name'):
+            return
+
         # Mark user as offline when disconnecting
         if hasattr(self, 'user') and self.user and not self.user.is_anonymous:
             try:
-                user_profile = await database_sync_to_async(UserProfile.objects.get)(user=self.user)
+                user_profile = await UserProfile.objects.aget(user=self.user)
                 user_profile.is_online = False
                 user_profile.last_seen = timezone.now()
-                await database_sync_to_async(user_profile.save)(update_fields=['is_online', 'last_seen'])
+                await user_profile.asave(update_fields=['is_online', 'last_seen'])
             except UserProfile.DoesNotExist:
                 pass  # User profile doesn't exist yet
         
-        # Only try to leave group if connection was established
-        if hasattr(self, 'room_group_name'):
-            await self.channel_layer.group_discard(
-                self.room_group_name,
-                self.channel_name
-            )
+        await self.channel_layer.group_discard(
+            self.room_group_name,
+            self.channel_name
+        )
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data is not None:
+            await self.receive_audio_frame(bytes_data)
+            return
 
-    async def receive(self, text_data):
         try:
-            data = json.loads(text_data)
+            data = orjson.loads(text_data)
             action_type = data.get('action_type', 'send')
             content = data.get('content')
-            sender_username = data.get('sender_username')
             message_type = data.get('message_type', 'text')
             audio_data_base64 = data.get('audio_data_base64')
             message_id = data.get('message_id')
@@ -162,156 +325,158 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 return
             
             # Validate required fields for message creation
-            if not sender_username:
-                await self.send(text_data=json.dumps({'error': 'sender_username is required'}))
-                return
-                
             if not content and message_type == 'text':
-                await self.send(text_data=json.dumps({'error': 'content is required for text messages'}))
+                await self.send(text_data=dump_json({'error': 'content is required for text messages'}))
                 return
                 
             if message_type == 'audio' and not audio_data_base64:
-                await self.send(text_data=json.dumps({'error': 'audio_data_base64 is required for audio messages'}))
+                # Binary protocol: this frame is the header, the audio follows as a binary frame
+                self._pending_audio_header = {
+                    'content': content or "Audio message",
+                    'length': data.get('length'),
+                }
                 return
 
-            # Find sender User
-            sender_user = await database_sync_to_async(User.objects.get)(username=sender_username)
-            
-            # Get or create UserProfile for sender
-            try:
-                sender_profile = await database_sync_to_async(UserProfile.objects.get)(user=sender_user)
-            except UserProfile.DoesNotExist:
-                # Create profile if it doesn't exist (for Google users)
-                phone = await generate_unique_phone_number()
-                sender_profile = await database_sync_to_async(UserProfile.objects.create)(
-                    user=sender_user,
-                    phone_number=phone
-                )
-
-            # Fetch conversation
-            conversation = await database_sync_to_async(Conversation.objects.get)(id=self.conversation_id)
-
-            # Find recipient: all participants except the sender
-            participants = await database_sync_to_async(lambda: list(conversation.participants.all()))()
-            recipient_profiles = [p for p in participants if p.id != sender_profile.id]
-            
-            if not recipient_profiles:
-                raise ValueError("No recipient found in conversation")
-                
-            recipient_profile = recipient_profiles[0]
-
-            # Process audio data if present
+            # Process audio data if present (legacy base64-in-JSON clients)
             audio_data = None
             if message_type == 'audio' and audio_data_base64:
-                import base64
-                audio_data = base64.b64decode(audio_data_base64)
-
-            # Create the message
-            message = await database_sync_to_async(Message.objects.create)(
-                conversation=conversation,
-                sender=sender_user,
-                recipient=recipient_profile,
-                content=content,
-                message_type=message_type,
-                audio_data=audio_data
-            )
+                audio_data = await decode_audio_base64(audio_data_base64)
 
-            # Auto-restore conversation for participants who deleted it
-            for participant in await database_sync_to_async(lambda: list(conversation.participants.all()))():
-                if await database_sync_to_async(lambda: participant in conversation.deleted_by.all())():
-                    await database_sync_to_async(conversation.deleted_by.remove)(participant)
-                    # DO NOT clear deletion timestamp - keep it so user only sees messages after deletion
-                    # The deletion timestamp should persist even after restoration
+            await self.store_and_broadcast(content, message_type, audio_data)
+        except PermissionDenied as e:
+            await self.send(text_data=dump_json({'error': str(e)}))
+        except Conversation.DoesNotExist:
+            await self.send(text_data=dump_json({'error': 'Conversation not found'}))
+        except Exception as e:
+            await self.send(text_data=dump_json({'error': str(e)}))
 
-            # Build absolute URL for profile pictures
-            base_url = f"{settings.BASE_API_URL}"
-            sender_picture_url = None
-            recipient_picture_url = None
+    async def receive_audio_frame(self, bytes_data):
+        """Handle the binary frame that follows an audio header frame"""
+        try:
+            header = self._pending_audio_header
+            self._pending_audio_header = None
 
-            if sender_profile.profile_picture:
-                sender_picture_url = f"{base_url}{sender_profile.profile_picture.url}"
-            if recipient_profile and recipient_profile.profile_picture:
-                recipient_picture_url = f"{base_url}{recipient_profile.profile_picture.url}"
+            if header is None:
+                await self.send(text_data=dump_json({'error': 'Binary frame received without an audio header'}))
+                return
 
-            # Prepare response data
-            response_data = {
-                "id": message.id,
-                "content": message.content,
-                "sender_username": sender_username,
-                "timestamp": message.timestamp.isoformat(),
-                "is_delivered": message.is_delivered,
-                "is_read": message.is_read,
-                "sender_profile_picture": sender_picture_url,
-                "recipient_profile_picture": recipient_picture_url,
-                "message_type": message.message_type
+            if header['length'] is not None and header['length'] != len(bytes_data):
+                await self.send(text_data=dump_json({'error': 'Audio length does not match header'}))
+                return
+
+            await self.store_and_broadcast(header['content'], 'audio', bytes_data, binary_audio=True)
+        except PermissionDenied as e:
+            await self.send(text_data=dump_json({'error': str(e)}))
+        except Conversation.DoesNotExist:
+            await self.send(text_data=dump_json({'error': 'Conversation not found'}))
+        except Exception as e:
+            await self.send(text_data=dump_json({'error': str(e)}))
+
+    async def store_and_broadcast(self, content, message_type, audio_data, binary_audio=False):
+        """Create a message from the authenticated user and broadcast it to the conversation group"""
+        # The sender is always the authenticated user, never a username taken from the payload.
+        # Context is normally loaded in connect(), retry here if it could not be resolved then
+        if self._ctx is None:
+            self._ctx = await load_message_context(self.user, self.user_profile, self.conversation_id)
+            self.user_profile = self._ctx.profile
+        ctx = self._ctx
+
+        # Create the message by id so signal handlers read fresh recipient state
+        message = await create_message(
+            conversation_id=ctx.conversation_id,
+            sender_id=ctx.user.id,
+            recipient_id=ctx.recipient_profile.id,
+            content=content,
+            message_type=message_type,
+            audio_data=audio_data
+        )
+
+        # Prepare response data
+        response_data = {
+            "id": message.id,
+            "content": message.content,
+            "sender_username": self.user.username,
+            "timestamp": message.timestamp.isoformat(),
+            "is_delivered": message.is_delivered,
+            "is_read": message.is_read,
+            "sender_profile_picture": ctx.sender_picture_url,
+            "recipient_profile_picture": ctx.recipient_picture_url,
+            "message_type": message.message_type
+        }
+
+        # Email notifications are now handled automatically by Django signals
+
+        if binary_audio:
+            # Broadcast the serialized header and raw audio bytes, receivers forward them as two frames
+            response_data["audio_length"] = len(audio_data)
+            response_data["audio_url"] = BASE_API_URL + reverse('message_audio', args=[message.id])
+            event = {
+                "type": "chat_message_bin",
+                "text": dump_json(response_data),
+                "bytes": audio_data,
             }
-            
+        else:
             # Add audio data if present
             if message.message_type == 'audio' and message.audio_data:
-                import base64
-                response_data["audio_data_base64"] = base64.b64encode(message.audio_data).decode('utf-8')
-
-            # Email notifications are now handled automatically by Django signals
+                response_data["audio_data_base64"] = await encode_audio_base64(message.audio_data)
+            event = {
+                "type": "chat_message",
+                "text": dump_json(response_data),
+            }
 
-            # Broadcast to the group
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    "type": "chat_message",
-                    "message": response_data,
-                }
-            )
-        except User.DoesNotExist:
-            await self.send(text_data=json.dumps({'error': 'User not found'}))
-        except Conversation.DoesNotExist:
-            await self.send(text_data=json.dumps({'error': 'Conversation not found'}))
-        except Exception as e:
-            await self.send(text_data=json.dumps({'error': str(e)}))
+        # Broadcast to the group while auto-restoring the conversation for participants who deleted it
+        await asyncio.gather(
+            self.channel_layer.group_send(self.room_group_name, event),
+            database_sync_to_async(restore_conversation_for_participants)(ctx.conversation_id),
+        )
 
     async def chat_message(self, event):
-        await self.send(text_data=json.dumps(event["message"]))
+        # Payload is serialized once by the sender, not by every receiving consumer
+        await self.send(text_data=event["text"])
+
+    async def chat_message_bin(self, event):
+        """Send an audio message header, followed by the raw audio as a binary frame if requested"""
+        await self.send(text_data=event["text"])
+        if self.binary_audio:
+            await self.send(bytes_data=event["bytes"])
         
     async def edit_message(self, data):
         try:
             message_id = data.get('message_id')
             content = data.get('content')
-            sender_username = data.get('sender_username')
             
-            if not message_id or not content or not sender_username:
-                await self.send(text_data=json.dumps({
+            if not message_id or not content:
+                await self.send(text_data=dump_json({
                     'error': 'Missing required fields for editing message'
                 }))
                 return
                 
-            # Get the sender user
-            sender_user = await get_user_by_username(sender_username)
-            
-            # Get the message and verify ownership
-            message = await get_message_by_id(message_id)
+            # Update the message, ownership and message type are enforced by the UPDATE itself
+            content = content.strip()
+            updated = await Message.objects.filter(
+                id=message_id,
+                sender_id=self.user.id,
+                message_type='text'
+            ).aupdate(content=content)
             
-            if message.sender.id != sender_user.id:
-                await self.send(text_data=json.dumps({
-                    'error': 'You do not have permission to edit this message'
-                }))
-                return
-                
-            # Verify message type is text
-            if message.message_type != 'text':
-                await self.send(text_data=json.dumps({
-                    'error': 'Only text messages can be edited'
-                }))
+            if not updated:
+                # Only the failure path pays for telling a non-text message apart from a missing one
+                if await Message.objects.filter(id=message_id, sender_id=self.user.id).aexists():
+                    error = 'Only text messages can be edited'
+                else:
+                    error = 'Message not found or you do not have permission to edit it'
+                await self.send(text_data=dump_json({'error': error}))
                 return
-                
-            # Update the message
-            await update_message_content(message, content)
+            
+            timestamp = await Message.objects.filter(id=message_id).values_list('timestamp', flat=True).afirst()
             
             # Prepare response data
             response_data = {
                 'action_type': 'edit',
                 'id': message_id,
-                'content': content.strip(),
-                'sender_username': sender_username,
-                'timestamp': message.timestamp.isoformat(),
+                'content': content,
+                'sender_username': self.user.username,
+                'timestamp': timestamp.isoformat(),
                 'message_type': 'text'
             }
             
@@ -320,48 +485,37 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.room_group_name,
                 {
                     'type': 'chat_message',
-                    'message': response_data,
+                    'text': dump_json(response_data),
                 }
             )
             
-        except User.DoesNotExist:
-            await self.send(text_data=json.dumps({'error': 'User not found'}))
-        except Message.DoesNotExist:
-            await self.send(text_data=json.dumps({'error': 'Message not found'}))
         except Exception as e:
-            await self.send(text_data=json.dumps({'error': str(e)}))
+            await self.send(text_data=dump_json({'error': str(e)}))
     
     async def delete_message(self, data):
         try:
             message_id = data.get('message_id')
-            sender_username = data.get('sender_username')
             
-            if not message_id or not sender_username:
-                await self.send(text_data=json.dumps({
+            if not message_id:
+                await self.send(text_data=dump_json({
                     'error': 'Missing required fields for deleting message'
                 }))
                 return
                 
-            # Get the sender user
-            sender_user = await get_user_by_username(sender_username)
+            # Delete the message, ownership is enforced by the same query
+            deleted_count, _ = await Message.objects.filter(id=message_id, sender_id=self.user.id).adelete()
             
-            # Get the message and verify ownership
-            message = await get_message_by_id(message_id)
-            
-            if message.sender.id != sender_user.id:
-                await self.send(text_data=json.dumps({
-                    'error': 'You do not have permission to delete this message'
+            if not deleted_count:
+                await self.send(text_data=dump_json({
+                    'error': 'Message not found or you do not have permission to delete it'
                 }))
                 return
-                
-            # Delete the message
-            await delete_message(message)
             
             # Prepare response data
             response_data = {
                 'action_type': 'delete',
                 'id': message_id,
-                'sender_username': sender_username
+                'sender_username': self.user.username
             }
             
             # Broadcast to the group
@@ -369,75 +523,67 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.room_group_name,
                 {
                     'type': 'chat_message',
-                    'message': response_data,
+                    'text': dump_json(response_data),
                 }
             )
             
-        except User.DoesNotExist:
-            await self.send(text_data=json.dumps({'error': 'User not found'}))
-        except Message.DoesNotExist:
-            await self.send(text_data=json.dumps({'error': 'Message not found'}))
         except Exception as e:
-            await self.send(text_data=json.dumps({'error': str(e)}))
+            await self.send(text_data=dump_json({'error': str(e)}))
     
     async def handle_typing(self, data):
         """Handle typing indicator"""
         try:
-            sender_username = data.get('sender_username')
-            if not sender_username:
-                return
-            
             # Broadcast typing indicator to the group
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
                     'type': 'typing_indicator',
-                    'username': sender_username,
+                    'username': self.user.username,
                     'is_typing': True
                 }
             )
         except Exception as e:
-            await self.send(text_data=json.dumps({'error': str(e)}))
+            await self.send(text_data=dump_json({'error': str(e)}))
     
     async def handle_stop_typing(self, data):
         """Handle stop typing indicator"""
         try:
-            sender_username = data.get('sender_username')
-            if not sender_username:
-                return
-            
             # Broadcast stop typing indicator to the group
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
                     'type': 'typing_indicator',
-                    'username': sender_username,
+                    'username': self.user.username,
                     'is_typing': False
                 }
             )
         except Exception as e:
-            await self.send(text_data=json.dumps({'error': str(e)}))
+            await self.send(text_data=dump_json({'error': str(e)}))
     
     async def handle_mark_read(self, data):
         """Handle marking messages as read"""
         try:
-            reader_username = data.get('reader_username')
             message_ids = data.get('message_ids', [])
             
-            if not reader_username or not message_ids:
+            if not message_ids:
                 return
             
-            # Get the reader user
-            reader_user = await get_user_by_username(reader_username)
-            reader_profile = await get_userprofile_by_user(reader_user)
+            # The reader is the authenticated user
+            reader_profile = self.user_profile or await UserProfile.objects.aget(user=self.user)
             
             # Mark messages as read
-            messages = await get_messages_by_ids(message_ids, reader_profile)
+            messages = [
+                msg async for msg in Message.objects.filter(
+                    id__in=message_ids,
+                    recipient=reader_profile,
+                    is_read=False
+                ).only('id')
+            ]
             
             if messages:
                 # Update messages to read
                 message_ids_to_update = [msg.id for msg in messages]
-                await mark_messages_as_read(message_ids_to_update)
+                await Message.objects.filter(id__in=message_ids_to_update).aupdate(is_read=True)
                 
                 # Cancel pending email notifications for read messages
                 for message in messages:
@@ -448,20 +594,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
                         {
                             'type': 'read_receipt',
                             'message_id': message.id,
-                            'reader_username': reader_username
+                            'reader_username': self.user.username
                         }
                     )
                     
-        except User.DoesNotExist:
-            await self.send(text_data=json.dumps({'error': 'User not found'}))
         except UserProfile.DoesNotExist:
-            await self.send(text_data=json.dumps({'error': 'User profile not found'}))
+            await self.send(text_data=dump_json({'error': 'User profile not found'}))
         except Exception as e:
-            await self.send(text_data=json.dumps({'error': str(e)}))
+            await self.send(text_data=dump_json({'error': str(e)}))
     
     async def typing_indicator(self, event):
         """Send typing indicator to WebSocket"""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=dump_json({
             'action_type': 'typing_indicator',
             'username': event['username'],
             'is_typing': event['is_typing']
@@ -469,7 +613,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
     
     async def read_receipt(self, event):
         """Send read receipt to WebSocket"""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=dump_json({
             'action_type': 'read_receipt',
             'message_id': event['message_id'],
             'reader_username': event['reader_username']
@@ -493,10 +637,11 @@ class ConversationListConsumer(AsyncWebsocketConsumer):
             
             # Mark user as online when connecting to conversation list (main presence indicator)
             try:
-                user_profile = await database_sync_to_async(UserProfile.objects.get)(user=self.user)
+                user_profile = await UserProfile.objects.aget(user=self.user)
                 user_profile.is_online = True
                 user_profile.last_seen = timezone.now()
-                await database_sync_to_async(user_profile.save)(update_fields=['is_online', 'last_seen'])
+                await user_profile.asave(update_fields=['is_online', 'last_seen'])
+                self.user_profile = user_profile
             except UserProfile.DoesNotExist:
                 pass  # User profile doesn't exist yet
             
@@ -508,10 +653,10 @@ class ConversationListConsumer(AsyncWebsocketConsumer):
         # Mark user as offline when disconnecting from conversation list
         if hasattr(self, 'user') and self.user and not self.user.is_anonymous:
             try:
-                user_profile = await database_sync_to_async(UserProfile.objects.get)(user=self.user)
+                user_profile = await UserProfile.objects.aget(user=self.user)
                 user_profile.is_online = False
                 user_profile.last_seen = timezone.now()
-                await database_sync_to_async(user_profile.save)(update_fields=['is_online', 'last_seen'])
+                await user_profile.asave(update_fields=['is_online', 'last_seen'])
             except UserProfile.DoesNotExist:
                 pass  # User profile doesn't exist yet
         
@@ -525,36 +670,36 @@ class ConversationListConsumer(AsyncWebsocketConsumer):
     async def receive(self, text_data):
         # Handle ping/pong and heartbeat messages
         try:
-            data = json.loads(text_data)
+            data = orjson.loads(text_data)
             message_type = data.get('type')
             
             if message_type == 'ping':
                 # Update last_seen time on heartbeat
                 if hasattr(self, 'user') and self.user and not self.user.is_anonymous:
                     try:
-                        user_profile = await database_sync_to_async(UserProfile.objects.get)(user=self.user)
+                        user_profile = await UserProfile.objects.aget(user=self.user)
                         user_profile.last_seen = timezone.now()
-                        await database_sync_to_async(user_profile.save)(update_fields=['last_seen'])
+                        await user_profile.asave(update_fields=['last_seen'])
                     except UserProfile.DoesNotExist:
                         pass
                 
-                await self.send(text_data=json.dumps({'type': 'pong'}))
+                await self.send(text_data=dump_json({'type': 'pong'}))
             elif message_type == 'heartbeat':
                 # Update user activity timestamp
                 if hasattr(self, 'user') and self.user and not self.user.is_anonymous:
                     try:
-                        user_profile = await database_sync_to_async(UserProfile.objects.get)(user=self.user)
+                        user_profile = await UserProfile.objects.aget(user=self.user)
                         user_profile.last_seen = timezone.now()
-                        await database_sync_to_async(user_profile.save)(update_fields=['last_seen'])
+                        await user_profile.asave(update_fields=['last_seen'])
                     except UserProfile.DoesNotExist:
                         pass
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             pass
     
     # Handle conversation updates
     async def conversation_update(self, event):
         """Send conversation update to WebSocket"""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=dump_json({
             'type': 'conversation_update',
             'conversation': event['conversation'],
             'is_new': event.get('is_new', False)
@@ -563,7 +708,7 @@ class ConversationListConsumer(AsyncWebsocketConsumer):
     # Handle conversation deletion
     async def conversation_delete(self, event):
         """Send conversation deletion to WebSocket"""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=dump_json({
             'type': 'conversation_delete',
             'conversation_id': event['conversation_id']
         }))
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+def backfill_pair_keys(apps, schema_editor):
+    Conversation = apps.get_model('chat', 'Conversation')
+    seen = set()
+    for conversation in Conversation.objects.prefetch_related('participants').order_by('id'):
+        participant_ids = [p.id for p in conversation.participants.all()]
+        if len(participant_ids) != 2:
+            continue
+        pair_key = f"{min(participant_ids)}:{max(participant_ids)}"
+        # Keep the oldest conversation as the canonical one for duplicate pairs
+        if pair_key in seen:
+            continue
+        seen.add(pair_key)
+        conversation.pair_key = pair_key
+        conversation.save(update_fields=['pair_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_message_conversation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='pair_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_pair_keys, migrations.RunPython.noop),
+    ]
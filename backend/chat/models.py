@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from users.models import UserProfile
 
@@ -7,6 +7,8 @@ from users.models import UserProfile
 class Conversation(models.Model):
     participants = models.ManyToManyField(UserProfile, related_name='conversations')
     deleted_by = models.ManyToManyField(UserProfile, related_name='deleted_conversations', blank=True)
+    # Denormalized "<low profile id>:<high profile id>" so 1-to-1 lookups are a single index hit
+    pair_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
     # Track when each user deleted the conversation
     deletion_timestamps = models.JSONField(default=dict, blank=True)  # {user_id: timestamp}
     created_at = models.DateTimeField(auto_now_add=True)
@@ -14,6 +16,24 @@ class Conversation(models.Model):
 
     def __str__(self):
         return f'Conversation: {[p.phone_number for p in self.participants.all()]}'
+
+    @staticmethod
+    def make_pair_key(profile_id, other_profile_id):
+        """Order-independent key identifying the 1-to-1 conversation between two profiles"""
+        return f"{min(profile_id, other_profile_id)}:{max(profile_id, other_profile_id)}"
+
+    @classmethod
+    def get_or_create_between(cls, profile, other_profile):
+        """Return (conversation, created) for two profiles, never leaving a conversation without participants"""
+        pair_key = cls.make_pair_key(profile.id, other_profile.id)
+        # The row and its participants commit together, a concurrent creator blocks on the
+        # pair_key unique index until then and reads the conversation with participants in place
+        with transaction.atomic():
+            conversation, created = cls.objects.get_or_create(pair_key=pair_key)
+            if created or conversation.participants.count() < 2:
+                # Also repairs pairs left without participants by an interrupted create
+                conversation.participants.add(profile, other_profile)
+        return conversation, created
     
 
 class Message(models.Model):
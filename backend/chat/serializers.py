@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import Message, Conversation
 from users.models import UserProfile
 from django.contrib.auth.models import User
+from django.urls import reverse
 
 class UserProfileSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username')
@@ -27,25 +28,41 @@ class MessageSerializer(serializers.ModelSerializer):
     sender_profile_picture = serializers.SerializerMethodField()
     recipient_profile_picture = serializers.SerializerMethodField()
     audio_data_base64 = serializers.SerializerMethodField()
+    audio_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Message
         fields = ['id', 'content', 'timestamp', 'is_delivered', 'is_read', 
                  'sender_username', 'sender_profile_picture', 'recipient_profile_picture',
-                 'message_type', 'audio_data_base64']
+                 'message_type', 'audio_data_base64', 'audio_url']
     
     def get_audio_data_base64(self, obj):
+        # List endpoints defer audio_data, clients load it from audio_url instead
+        if 'audio_data' in obj.get_deferred_fields():
+            return None
         if obj.message_type == 'audio' and obj.audio_data:
             import base64
             return base64.b64encode(obj.audio_data).decode('utf-8')
         return None
 
+    def get_audio_url(self, obj):
+        if obj.message_type == 'audio':
+            return self.context['request'].build_absolute_uri(reverse('message_audio', args=[obj.id]))
+        return None
+
     def get_sender_profile_picture(self, obj):
+        # Views serializing many messages precompute the URLs per participant
+        sender_pictures = self.context.get('sender_pictures')
+        if sender_pictures is not None and obj.sender_id in sender_pictures:
+            return sender_pictures[obj.sender_id]
         if obj.sender.userprofile.profile_picture:
             return self.context['request'].build_absolute_uri(obj.sender.userprofile.profile_picture.url)
         return None
 
     def get_recipient_profile_picture(self, obj):
+        recipient_pictures = self.context.get('recipient_pictures')
+        if recipient_pictures is not None and obj.recipient_id in recipient_pictures:
+            return recipient_pictures[obj.recipient_id]
         if obj.recipient.profile_picture:
             return self.context['request'].build_absolute_uri(obj.recipient.profile_picture.url)
         return None
@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Message
+from .models import Conversation, Message
+from .utils import invalidate_conversation_members
 
 
 @receiver(post_save, sender=Message)
@@ -57,3 +58,22 @@ def cancel_email_notification_on_read(sender, instance, created, **kwargs):
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f"[SIGNAL] Failed to cancel email notifications for message {instance.id}: {str(e)}")
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def invalidate_members_on_participant_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop cached conversation membership when participants are added or removed"""
+    if not reverse:
+        # instance is the conversation
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_conversation_members(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        # instance is a user profile, pk_set holds the affected conversation ids
+        invalidate_conversation_members(*pk_set)
+    elif action == 'pre_clear':
+        invalidate_conversation_members(*instance.conversations.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Conversation)
+def invalidate_members_on_conversation_delete(sender, instance, **kwargs):
+    invalidate_conversation_members(instance.pk)
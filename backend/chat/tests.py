@@ -1,3 +1,142 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .middleware import JWTAuthMiddlewareStack
+from .models import Conversation, Message
+from .routing import websocket_urlpatterns
+
+TEST_SETTINGS = {
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+}
+
+
+def create_conversation(*users):
+    """Create a 1-to-1 conversation between two users through the same helper the views use"""
+    conversation, _ = Conversation.get_or_create_between(*(user.userprofile for user in users))
+    return conversation
+
+
+# Users are created without an email address so message signals never schedule email tasks
+@override_settings(**TEST_SETTINGS)
+class ChatConsumerAuthorizationTests(TransactionTestCase):
+    def setUp(self):
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.carol = User.objects.create(username='carol')
+        self.conversation = create_conversation(self.alice, self.bob)
+
+    def communicator(self, user, conversation_id):
+        application = JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+        token = AccessToken.for_user(user)
+        return WebsocketCommunicator(application, f"/ws/chat/{conversation_id}/?token={token}")
+
+    async def test_sender_is_the_authenticated_user(self):
+        communicator = self.communicator(self.alice, self.conversation.id)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        # A sender_username in the payload must not let a participant speak for someone else
+        await communicator.send_json_to({'content': 'hello', 'sender_username': 'bob'})
+        response = await communicator.receive_json_from(timeout=5)
+        await communicator.disconnect()
+
+        self.assertEqual(response['sender_username'], 'alice')
+        message = await Message.objects.select_related('sender').aget(id=response['id'])
+        self.assertEqual(message.sender, self.alice)
+
+    async def test_non_participant_is_rejected(self):
+        communicator = self.communicator(self.carol, self.conversation.id)
+        connected, code = await communicator.connect()
+
+        self.assertFalse(connected)
+        self.assertEqual(code, 4003)
+        self.assertFalse(await Message.objects.filter(conversation=self.conversation).aexists())
+
+    async def test_missing_conversation_is_rejected(self):
+        communicator = self.communicator(self.alice, self.conversation.id + 1000)
+        connected, code = await communicator.connect()
+
+        self.assertFalse(connected)
+        self.assertEqual(code, 4004)
+
+    async def test_unauthenticated_socket_is_rejected(self):
+        application = JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+        communicator = WebsocketCommunicator(application, f"/ws/chat/{self.conversation.id}/")
+        connected, code = await communicator.connect()
+
+        self.assertFalse(connected)
+        self.assertEqual(code, 4001)
+
+
+@override_settings(**TEST_SETTINGS)
+class MessageAudioViewTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.carol = User.objects.create(username='carol')
+        self.conversation = create_conversation(self.alice, self.bob)
+        self.message = Message.objects.create(
+            conversation=self.conversation,
+            sender=self.alice,
+            recipient=self.bob.userprofile,
+            content='Audio message',
+            message_type='audio',
+            audio_data=b'\x00\x01audio',
+        )
+        self.url = reverse('message_audio', args=[self.message.id])
+
+    def get_audio(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(self.url)
+
+    def test_participant_gets_raw_audio(self):
+        response = self.get_audio(self.bob)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'audio/webm')
+        self.assertEqual(b''.join(response.streaming_content), b'\x00\x01audio')
+
+    def test_non_participant_is_denied(self):
+        response = self.get_audio(self.carol)
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_text_message_has_no_audio(self):
+        text_message = Message.objects.create(
+            conversation=self.conversation,
+            sender=self.alice,
+            recipient=self.bob.userprofile,
+            content='hello',
+        )
+        client = APIClient()
+        client.force_authenticate(self.bob)
+        response = client.get(reverse('message_audio', args=[text_message.id]))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_audio_from_before_deletion_is_hidden(self):
+        # Bob deleted the conversation after the audio message was sent
+        deleted_at = self.message.timestamp + timedelta(seconds=1)
+        self.conversation.deletion_timestamps = {str(self.bob.userprofile.id): deleted_at.isoformat()}
+        self.conversation.save()
+
+        self.assertEqual(self.get_audio(self.bob).status_code, 404)
+        # The other participant did not delete it and still has access
+        self.assertEqual(self.get_audio(self.alice).status_code, 200)
+
+    def test_audio_sent_after_deletion_is_served(self):
+        deleted_at = timezone.now() - timedelta(days=1)
+        self.conversation.deletion_timestamps = {str(self.bob.userprofile.id): deleted_at.isoformat()}
+        self.conversation.save()
+
+        self.assertEqual(self.get_audio(self.bob).status_code, 200)
@@ -7,7 +7,8 @@ from .views import (
     CreateConversationView,
     EditMessageView,
     DeleteMessageView,
-    DeleteConversationView
+    DeleteConversationView,
+    MessageAudioView
 )
 
 urlpatterns = [
@@ -18,5 +19,6 @@ urlpatterns = [
     path('create-conversation/', CreateConversationView.as_view(), name='create_conversation'),
     path('message/<int:message_id>/edit/', EditMessageView.as_view(), name='edit_message'),
     path('message/<int:message_id>/delete/', DeleteMessageView.as_view(), name='delete_message'),
+    path('message/<int:message_id>/audio/', MessageAudioView.as_view(), name='message_audio'),
     path('conversation/<int:conversation_id>/delete/', DeleteConversationView.as_view(), name='delete_conversation')
 ]
@@ -2,6 +2,11 @@ from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from .serializers import ConversationSerializer
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from .models import Conversation
+
+# Membership changes invalidate the entry, the TTL only bounds staleness from cascade deletes
+CONVERSATION_MEMBERS_TTL = 60 * 60 * 24
 
 
 def send_conversation_update(conversation, is_new=False, request=None):
@@ -35,6 +40,43 @@ def send_conversation_update(conversation, is_new=False, request=None):
         )
 
 
+def restore_conversation_for_participants(conversation_id):
+    """
+    Auto-restore a conversation for participants who deleted it.
+    The deletion timestamps are kept so users only see messages sent after deletion.
+    """
+    # Only participants can delete a conversation, so clearing its rows in the
+    # deleted_by through table is a single indexed DELETE on conversation_id
+    Conversation.deleted_by.through.objects.filter(conversation_id=conversation_id).delete()
+
+
+def conversation_members_key(conversation_id):
+    return f"conv:{conversation_id}:participants"
+
+
+def get_conversation_members(conversation_id):
+    """
+    Return the participant profile ids of a conversation as a tuple, cached across workers.
+    Returns None if the conversation does not exist.
+    """
+    key = conversation_members_key(conversation_id)
+    members = cache.get(key)
+    if members is None:
+        if not Conversation.objects.filter(id=conversation_id).exists():
+            return None
+        members = tuple(
+            Conversation.participants.through.objects
+            .filter(conversation_id=conversation_id)
+            .values_list('userprofile_id', flat=True)
+        )
+        cache.set(key, members, CONVERSATION_MEMBERS_TTL)
+    return members
+
+
+def invalidate_conversation_members(*conversation_ids):
+    cache.delete_many([conversation_members_key(conversation_id) for conversation_id in conversation_ids])
+
+
 def send_conversation_delete(conversation_id, user_id):
     """
     Send real-time conversation deletion update to a specific user
@@ -1,4 +1,4 @@
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
@@ -9,10 +9,54 @@ from users.models import UserProfile
 from .models import Conversation, Message
 from .serializers import MessageSerializer, ConversationSerializer
 from django.shortcuts import get_object_or_404
-from .utils import send_conversation_update, send_conversation_delete
+from .utils import send_conversation_update, send_conversation_delete, restore_conversation_for_participants
 from .tasks import create_and_schedule_email_notification
 import json
+import logging
 from django.utils import timezone
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+# Columns needed to serialize a message in the list endpoint, audio_data is deliberately left out
+# Profile pictures come from the participant maps built by get_serializer_context()
+MESSAGE_LIST_FIELDS = (
+    'id', 'content', 'message_type', 'timestamp', 'is_delivered', 'is_read',
+    'sender__username', 'recipient',
+)
+
+# Formats timestamps exactly like MessageSerializer (current time zone, 'Z' for UTC)
+TIMESTAMP_FIELD = serializers.DateTimeField()
+
+
+def build_message_data(message, sender_profile, recipient_profile, request, audio_data_base64=None):
+    """
+    Build the MessageSerializer representation of a message that was just created,
+    reusing the objects already in memory instead of walking DRF fields
+    """
+    sender_picture = None
+    recipient_picture = None
+    if sender_profile.profile_picture:
+        sender_picture = request.build_absolute_uri(sender_profile.profile_picture.url)
+    if recipient_profile.profile_picture:
+        recipient_picture = request.build_absolute_uri(recipient_profile.profile_picture.url)
+
+    return {
+        'id': message.id,
+        'content': message.content,
+        'timestamp': TIMESTAMP_FIELD.to_representation(message.timestamp),
+        'is_delivered': message.is_delivered,
+        'is_read': message.is_read,
+        'sender_username': sender_profile.user.username,
+        'sender_profile_picture': sender_picture,
+        'recipient_profile_picture': recipient_picture,
+        'message_type': message.message_type,
+        'audio_data_base64': audio_data_base64 if message.message_type == 'audio' and message.audio_data else None,
+        'audio_url': request.build_absolute_uri(reverse('message_audio', args=[message.id])) if message.message_type == 'audio' else None,
+    }
+
+
 class SendMessageView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -38,18 +82,7 @@ class SendMessageView(APIView):
             return Response({"error": "Recipient not found."}, status=status.HTTP_404_NOT_FOUND)
 
         # Get or create conversation between the two users
-        conversation = (
-            Conversation.objects
-            .filter(participants=sender.userprofile)
-            .filter(participants=recipient_profile)
-            .first()
-        )
-        is_new_conversation = False
-        if not conversation:
-            conversation = Conversation.objects.create()
-            conversation.participants.add(sender.userprofile, recipient_profile)
-            conversation.save()
-            is_new_conversation = True
+        conversation, is_new_conversation = Conversation.get_or_create_between(sender.userprofile, recipient_profile)
 
         # Process audio data if present
         audio_data = None
@@ -71,10 +104,7 @@ class SendMessageView(APIView):
         )
 
         # Auto-restore conversation for participants who deleted it
-        for participant in conversation.participants.all():
-            if participant in conversation.deleted_by.all():
-                conversation.deleted_by.remove(participant)
-                # DO NOT clear deletion timestamp - keep it so user only sees messages after deletion
+        restore_conversation_for_participants(conversation.id)
 
         # Email notifications are now handled automatically by Django signals
         
@@ -82,11 +112,10 @@ class SendMessageView(APIView):
         send_conversation_update(conversation, is_new=is_new_conversation, request=request)
         
         # Serialize response data
-        message_serializer = MessageSerializer(message, context={'request': request})
         conversation_serializer = ConversationSerializer(conversation, context={'request': request})
         
         response_data = {
-            'message': message_serializer.data,
+            'message': build_message_data(message, sender.userprofile, recipient_profile, request, audio_data_base64),
             'conversation': conversation_serializer.data,
             'conversation_id': conversation.id,
             'is_new_conversation': is_new_conversation
@@ -141,20 +170,20 @@ class UserConversationsView(APIView):
 
 class ConversationMessagesView(APIView):
     permission_classes = [IsAuthenticated]
+    max_cursor_limit = 100
 
     def get(self, request, conversation_id):
         try:
             conversation = Conversation.objects.get(id=conversation_id, participants=request.user.userprofile)
             
-            # Get pagination parameters
-            page = int(request.GET.get('page', 1))
-            page_size = int(request.GET.get('page_size', 50))  # Default 50 messages per page
-            
-            # Calculate offset
-            offset = (page - 1) * page_size
-            
-            # Get messages based on user's deletion timestamp
-            messages_query = Message.objects.filter(conversation=conversation)
+            # Get messages based on user's deletion timestamp.
+            # audio_data is never loaded here, clients fetch it from the per-message audio endpoint
+            messages_query = (
+                Message.objects
+                .filter(conversation=conversation)
+                .select_related('sender')
+                .only(*MESSAGE_LIST_FIELDS)
+            )
             
             # Check if user has a deletion timestamp
             deletion_timestamps = conversation.deletion_timestamps or {}
@@ -166,6 +195,27 @@ class ConversationMessagesView(APIView):
                 deletion_datetime = timezone.datetime.fromisoformat(user_deletion_time)
                 messages_query = messages_query.filter(timestamp__gt=deletion_datetime)
             
+            serializer_context = self.get_serializer_context(request, conversation)
+            
+            # Cursor mode: ?limit=N for the newest page, then ?before=<next_before>&limit=N for older ones
+            before = request.GET.get('before')
+            limit = request.GET.get('limit')
+            if before is not None or limit is not None:
+                try:
+                    before = int(before) if before is not None else None
+                    limit = int(limit) if limit is not None else 50
+                except ValueError:
+                    return Response({"error": "before and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+                limit = max(1, min(limit, self.max_cursor_limit))
+                return self.get_cursor_page(request, messages_query, before, limit, serializer_context)
+            
+            # Get pagination parameters
+            page = int(request.GET.get('page', 1))
+            page_size = int(request.GET.get('page_size', 50))  # Default 50 messages per page
+            
+            # Calculate offset
+            offset = (page - 1) * page_size
+            
             # Get total count for pagination info
             total_messages = messages_query.count()
             
@@ -174,15 +224,9 @@ class ConversationMessagesView(APIView):
             messages = list(messages_query.order_by('-timestamp')[offset:offset + page_size])
             messages.reverse()  # Reverse to show chronological order
             
-            # Mark messages as read (only for current page)
-            message_ids = [msg.id for msg in messages]
-            Message.objects.filter(
-                id__in=message_ids,
-                recipient=request.user.userprofile,
-                is_read=False
-            ).update(is_read=True)
+            self.mark_as_read(request, messages)
             
-            serializer = MessageSerializer(messages, many=True, context={'request': request})
+            serializer = MessageSerializer(messages, many=True, context=serializer_context)
             
             # Calculate pagination metadata
             total_pages = (total_messages + page_size - 1) // page_size
@@ -203,6 +247,87 @@ class ConversationMessagesView(APIView):
         except Conversation.DoesNotExist:
             return Response({"error": "Conversation not found or access denied."}, status=404)
 
+    def get_cursor_page(self, request, messages_query, before, limit, serializer_context):
+        """Return up to `limit` messages older than the message id `before` (newest if None), without counting the history"""
+        if before is not None:
+            messages_query = messages_query.filter(id__lt=before)
+        # Fetch one extra row to know whether older messages exist
+        messages = list(messages_query.order_by('-id')[:limit + 1])
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        messages.reverse()  # Reverse to show chronological order
+        
+        self.mark_as_read(request, messages)
+        
+        serializer = MessageSerializer(messages, many=True, context=serializer_context)
+        return Response({
+            'messages': serializer.data,
+            'pagination': {
+                'limit': limit,
+                'has_more': has_more,
+                'next_before': messages[0].id if has_more else None
+            }
+        })
+
+    def get_serializer_context(self, request, conversation):
+        """Build each participant's absolute profile picture URL once for the whole page"""
+        sender_pictures = {}
+        recipient_pictures = {}
+        for profile in conversation.participants.only('id', 'user_id', 'profile_picture'):
+            url = request.build_absolute_uri(profile.profile_picture.url) if profile.profile_picture else None
+            # Messages reference the sender by user and the recipient by profile
+            sender_pictures[profile.user_id] = url
+            recipient_pictures[profile.id] = url
+        return {
+            'request': request,
+            'sender_pictures': sender_pictures,
+            'recipient_pictures': recipient_pictures,
+        }
+
+    def mark_as_read(self, request, messages):
+        # Mark messages as read (only for current page)
+        message_ids = [msg.id for msg in messages]
+        Message.objects.filter(
+            id__in=message_ids,
+            recipient=request.user.userprofile,
+            is_read=False
+        ).update(is_read=True)
+
+class MessageAudioView(APIView):
+    permission_classes = [IsAuthenticated]
+    chunk_size = 64 * 1024
+
+    def get(self, request, message_id):
+        try:
+            message = (
+                Message.objects
+                .select_related('conversation')
+                .only('id', 'audio_data', 'timestamp', 'conversation__deletion_timestamps')
+                .get(
+                    id=message_id,
+                    message_type='audio',
+                    conversation__participants=request.user.userprofile
+                )
+            )
+        except Message.DoesNotExist:
+            return Response({"error": "Audio message not found or access denied."}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Messages from before the user deleted the conversation are hidden, same as in the history
+        deletion_timestamps = message.conversation.deletion_timestamps or {}
+        user_deletion_time = deletion_timestamps.get(str(request.user.userprofile.id))
+        if user_deletion_time and message.timestamp <= timezone.datetime.fromisoformat(user_deletion_time):
+            return Response({"error": "Audio message not found or access denied."}, status=status.HTTP_404_NOT_FOUND)
+        
+        if not message.audio_data:
+            return Response({"error": "Audio message has no audio data."}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Stream the raw bytes as stored, no base64 round trip
+        audio = memoryview(message.audio_data)
+        chunks = (bytes(audio[start:start + self.chunk_size]) for start in range(0, len(audio), self.chunk_size))
+        response = StreamingHttpResponse(chunks, content_type='audio/webm')
+        response['Content-Length'] = len(audio)
+        return response
+
 class SendMessageInConversationView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -249,19 +374,15 @@ class SendMessageInConversationView(APIView):
         )
 
         # Auto-restore conversation for participants who deleted it
-        for participant in conversation.participants.all():
-            if participant in conversation.deleted_by.all():
-                conversation.deleted_by.remove(participant)
-                # DO NOT clear deletion timestamp - keep it so user only sees messages after deletion
-                # The deletion timestamp should persist even after restoration
+        restore_conversation_for_participants(conversation.id)
 
         # Email notifications are now handled automatically by Django signals
             
         # Send real-time conversation update (not new, just update)
         send_conversation_update(conversation, is_new=False, request=request)
         
-        serializer = MessageSerializer(message, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        message_data = build_message_data(message, user_profile, recipient_profile, request, audio_data_base64)
+        return Response(message_data, status=status.HTTP_201_CREATED)
 
 class CreateConversationView(APIView):
     permission_classes = [IsAuthenticated]
@@ -278,16 +399,7 @@ class CreateConversationView(APIView):
             return Response({"error": "Recipient not found."}, status=status.HTTP_404_NOT_FOUND)
 
         # Check if conversation already exists
-        conversation = (
-            Conversation.objects
-            .filter(participants=user_profile)
-            .filter(participants=recipient_profile)
-            .first()
-        )
-        if not conversation:
-            conversation = Conversation.objects.create()
-            conversation.participants.add(user_profile, recipient_profile)
-            conversation.save()
+        conversation, created = Conversation.get_or_create_between(user_profile, recipient_profile)
 
         serializer = ConversationSerializer(conversation, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -323,12 +435,12 @@ class DeleteMessageView(APIView):
 
     def delete(self, request, message_id):
         try:
-            message = Message.objects.get(id=message_id, sender=request.user)
+            message = Message.objects.only('id', 'conversation_id').get(id=message_id, sender=request.user)
         except Message.DoesNotExist:
             return Response({"error": "Message not found or you don't have permission to delete it."}, 
                             status=status.HTTP_404_NOT_FOUND)
         
-        conversation_id = message.conversation.id
+        conversation_id = message.conversation_id
         message.delete()
         
         return Response({"success": True, "message": "Message deleted successfully", "conversation_id": conversation_id})
@@ -339,10 +451,11 @@ class DeleteConversationView(APIView):
 
     def delete(self, request, conversation_id):
         try:
-            # Debug: Print user info
-            print(f"User: {request.user.username}, User ID: {request.user.id}")
-            print(f"User Profile: {request.user.userprofile.id if hasattr(request.user, 'userprofile') else 'No profile'}")
-            print(f"Conversation ID: {conversation_id}")
+            # Debug: Log user info, skipped entirely unless DEBUG logging is enabled
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("User: %s, User ID: %s", request.user.username, request.user.id)
+                logger.debug("User Profile: %s", request.user.userprofile.id if hasattr(request.user, 'userprofile') else 'No profile')
+                logger.debug("Conversation ID: %s", conversation_id)
             
             conversation = Conversation.objects.get(id=conversation_id, participants=request.user.userprofile)
             conversation.deleted_by.add(request.user.userprofile)
@@ -356,8 +469,8 @@ class DeleteConversationView(APIView):
             
             return Response({"success": True, "message": "Conversation deleted successfully"})
         except Conversation.DoesNotExist:
-            print(f"Conversation {conversation_id} not found or user {request.user.username} not a participant")
+            logger.debug("Conversation %s not found or user %s not a participant", conversation_id, request.user.username)
             return Response({"error": "Conversation not found or access denied."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            print(f"Error in delete_conversation: {str(e)}")
+            logger.exception("Error in delete_conversation: %s", e)
             return Response({"error": f"Server error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
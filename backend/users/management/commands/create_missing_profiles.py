@@ -1,7 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from users.models import UserProfile
-from users.signals import generate_unique_phone_number
+from users.signals import create_profile_with_phone_number
 
 class Command(BaseCommand):
     help = 'Creates UserProfile for users that do not have one'
@@ -11,8 +10,7 @@ class Command(BaseCommand):
         created_count = 0
         
         for user in users_without_profile:
-            phone = generate_unique_phone_number()
-            UserProfile.objects.create(user=user, phone_number=phone)
+            create_profile_with_phone_number(user)
             created_count += 1
             
         self.stdout.write(
@@ -1,18 +1,29 @@
 # users/signals.py
+from django.db import IntegrityError, transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import UserProfile
-import random
+import secrets
 
-def generate_unique_phone_number():
-    while True:
-        number = f"03{random.randint(100000000, 999999999)}"
-        if not UserProfile.objects.filter(phone_number=number).exists():
-            return number
+PHONE_NUMBER_ATTEMPTS = 5
+
+def generate_phone_number():
+    return f"03{secrets.randbelow(900_000_000) + 100_000_000}"
+
+def create_profile_with_phone_number(user):
+    """Create a profile with a random phone number, retrying on the rare unique collision"""
+    # Let the unique constraint catch duplicates instead of checking first, one query and no race
+    for attempt in range(PHONE_NUMBER_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return UserProfile.objects.create(user=user, phone_number=generate_phone_number())
+        except IntegrityError:
+            # Only a phone number collision is worth retrying, not an existing profile for the user
+            if attempt == PHONE_NUMBER_ATTEMPTS - 1 or UserProfile.objects.filter(user=user).exists():
+                raise
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
-        phone = generate_unique_phone_number()
-        UserProfile.objects.create(user=instance, phone_number=phone)
+        create_profile_with_phone_number(instance)
@@ -1,15 +1,41 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { Play, Pause, Headphones } from 'lucide-react';
+import axiosInstance from '../../utils/axiosConfig';
 
-const AudioMessage = ({ audioData, isCurrentUser, messageId }) => {
+const AudioMessage = ({ audioData, audioUrl, isCurrentUser, messageId }) => {
   const [isPlaying, setIsPlaying] = useState(false);
   const [currentTime, setCurrentTime] = useState(0);
   const [duration, setDuration] = useState(0);
   const [isLoading, setIsLoading] = useState(true);
   const [hoverPosition, setHoverPosition] = useState(-1);
+  const [audioSrc, setAudioSrc] = useState(audioData ? `data:audio/webm;base64,${audioData}` : null);
   const audioRef = useRef(null);
   const animationRef = useRef(null);
 
+  // Message history only carries an audio URL, fetch the raw bytes with the auth header
+  useEffect(() => {
+    if (audioData) {
+      setAudioSrc(`data:audio/webm;base64,${audioData}`);
+      return;
+    }
+    if (!audioUrl) return;
+
+    let objectUrl = null;
+    let cancelled = false;
+    axiosInstance.get(audioUrl, { responseType: 'blob' })
+      .then((res) => {
+        if (cancelled) return;
+        objectUrl = URL.createObjectURL(res.data);
+        setAudioSrc(objectUrl);
+      })
+      .catch(() => setIsLoading(false));
+
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [audioData, audioUrl]);
+
   // Format time properly - seconds first, then minutes if long
   const formatTime = (timeInSeconds) => {
     if (!isFinite(timeInSeconds) || isNaN(timeInSeconds)) return "0:00";
@@ -210,7 +236,7 @@ const AudioMessage = ({ audioData, isCurrentUser, messageId }) => {
       {/* Hidden Audio Element */}
       <audio
         ref={audioRef}
-        src={`data:audio/webm;base64,${audioData}`}
+        src={audioSrc || undefined}
         onTimeUpdate={handleTimeUpdate}
         onLoadedMetadata={handleLoadedMetadata}
         onPlay={handlePlay}
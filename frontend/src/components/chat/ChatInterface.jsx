@@ -5,9 +5,10 @@ import { User, Send, Phone, Video, MoreVertical, MessageCircle, Check, CheckChec
 import InputField from "../common/InputField";
 import Avatar from "../common/Avatar";
 import EmojiPicker from 'emoji-picker-react';
-import usePagination from '../../hooks/usePagination';
 import AudioMessage from './AudioMessage';
 
+const MESSAGES_PAGE_SIZE = 15;
+
 function ChatInterface({ 
   selectedConversation, 
   recipientPhone, 
@@ -45,16 +46,10 @@ function ChatInterface({
   // Add state for tracking visible messages for read receipts
   const visibleMessagesRef = useRef(new Set());
   
-  // Pagination state for messages
-  const {
-    currentPage: messagePage,
-    hasNext: hasMoreMessages,
-    updatePaginationData: updateMessagePagination,
-    nextPage: loadMoreMessages,
-    loading: messagesLoading,
-    setLoading: setMessagesLoading,
-    reset: resetMessagePagination
-  } = usePagination(15); // 15 messages per page
+  // Cursor pagination state for messages: id to load older messages before, null when there are none
+  const [nextBefore, setNextBefore] = useState(null);
+  const [messagesLoading, setMessagesLoading] = useState(false);
+  const hasMoreMessages = nextBefore !== null;
   
   // State to track if we should show "see older messages" button
   const [showLoadOlderButton, setShowLoadOlderButton] = useState(false);
@@ -78,16 +73,16 @@ function ChatInterface({
     if (selectedConversation) {
       const loadInitialConversation = async () => {
         try {
-          resetMessagePagination();
+          setNextBefore(null);
           const res = await axiosInstance.get(
-            `${ENV.BASE_API_URL}/chat/api/conversation/${selectedConversation.id}/messages/?page=1&page_size=15`
+            `${ENV.BASE_API_URL}/chat/api/conversation/${selectedConversation.id}/messages/?limit=${MESSAGES_PAGE_SIZE}`
           );
           if (res.status === 200) {
             console.log('Messages API Response:', res.data);
             setMessages(res.data.messages || res.data);
             if (res.data.pagination) {
               console.log('Messages Pagination Data:', res.data.pagination);
-              updateMessagePagination(res.data.pagination);
+              setNextBefore(res.data.pagination.next_before ?? null);
             }
             // Auto-scroll to bottom on initial load to show latest messages
             setTimeout(() => {
@@ -202,7 +197,8 @@ function ChatInterface({
                 id: data.id,
                 sender_profile_picture: data.sender_profile_picture,
                 message_type: data.message_type || 'text',
-                audio_data_base64: data.audio_data_base64
+                audio_data_base64: data.audio_data_base64,
+                audio_url: data.audio_url
               };
 
               setMessages((prev) => {
@@ -228,7 +224,8 @@ function ChatInterface({
               id: data.id,
               sender_profile_picture: data.sender_profile_picture,
               message_type: data.message_type || 'text',
-              audio_data_base64: data.audio_data_base64
+              audio_data_base64: data.audio_data_base64,
+              audio_url: data.audio_url
             };
 
             setMessages((prev) => {
@@ -563,13 +560,13 @@ function ChatInterface({
   
   // Fetch older messages if available
   const handleLoadOlderMessages = async () => {
-    if (!selectedConversation) return;
+    if (!selectedConversation || !hasMoreMessages) return;
 
     setMessagesLoading(true);
     
     try {
       const res = await axiosInstance.get(
-        `${ENV.BASE_API_URL}/chat/api/conversation/${selectedConversation.id}/messages/?page=${messagePage + 1}&page_size=15`
+        `${ENV.BASE_API_URL}/chat/api/conversation/${selectedConversation.id}/messages/?before=${nextBefore}&limit=${MESSAGES_PAGE_SIZE}`
       );
 
       if (res.status === 200) {
@@ -577,7 +574,7 @@ function ChatInterface({
         setMessages((prevMessages) => [...res.data.messages, ...prevMessages]);
         if (res.data.pagination) {
           console.log('Load More Messages Pagination Data:', res.data.pagination);
-          updateMessagePagination(res.data.pagination);
+          setNextBefore(res.data.pagination.next_before ?? null);
         }
       }
     } catch (error) {
@@ -735,6 +732,7 @@ function ChatInterface({
                   
                   <AudioMessage 
                     audioData={msg.audio_data_base64} 
+                    audioUrl={msg.audio_url}
                     isCurrentUser={isCurrentUser}
                     messageId={msg.id}
                   />